@@ -1,6 +1,10 @@
 import streamlit as st
-import math
 import urllib.parse
+import numpy as np
+import pandas as pd
+
+import steuerkern
+from steuerkern import BBG_KV_PV, BBG_RV_AV, Abzuege
 
 # --- SEITENKONFIGURATION ---
 st.set_page_config(page_title="Gehaltsrechner DE", page_icon="💰", layout="centered")
@@ -13,8 +17,7 @@ st.write("Berechnen Sie Ihr verfügbares Einkommen und wie lange Sie für eine A
 st.caption("**Transparenzhinweis:** Als Amazon-Partner verdiene ich an qualifizierten Verkäufen. Für Sie entstehen keine Mehrkosten.")
 
 # --- KONSTANTEN FÜR DEUTSCHLAND (Stand 2024/2025) ---
-BBG_KV_PV = 5175.00
-BBG_RV_AV = 7550.00
+# BBG, Freibeträge und Soli liegen beim Rechenkern in steuerkern.py
 SATZ_RV = 0.093
 SATZ_AV = 0.013
 SATZ_KV_ALLG = 0.073
@@ -23,85 +26,78 @@ SATZ_KV_GESAMT = SATZ_KV_ALLG + SATZ_KV_ZUSATZ
 SATZ_PV_MIT_KIND = 0.017
 SATZ_PV_OHNE_KIND_ZUSCHLAG = 0.006
 SATZ_PV_OHNE_KIND = SATZ_PV_MIT_KIND + SATZ_PV_OHNE_KIND_ZUSCHLAG
-GRUNDFREIBETRAG = {1: 11604, 2: 11604, 3: 23208, 4: 11604, 5: 0, 6: 0}
-ENTLASTUNGSBETRAG_SK2 = 4260
+BUNDESLAENDER = (
+    "Baden-Württemberg", "Bayern", "Berlin", "Brandenburg", "Bremen", "Hamburg", "Hessen",
+    "Mecklenburg-Vorpommern", "Niedersachsen", "Nordrhein-Westfalen", "Rheinland-Pfalz",
+    "Saarland", "Sachsen", "Sachsen-Anhalt", "Schleswig-Holstein", "Thüringen"
+)
+ANSTELLUNGSARTEN = ("Angestellte/r", "Auszubildende/r", "Werkstudent/in", "Beamte/Beamtin")
+STEUERKLASSEN = (1, 2, 3, 4, 5, 6)
+JA_NEIN = ("Ja", "Nein")
+KIRCHENSTEUER_8_PROZENT = frozenset({"Bayern", "Baden-Württemberg"})
+KIRCHENSTEUER_RATE = {bl: (0.08 if bl in KIRCHENSTEUER_8_PROZENT else 0.09) for bl in BUNDESLAENDER}
+# Beitragssätze (KV, PV, RV, AV) je Anstellungsart und Kinder-Status, einmalig vorberechnet
+SV_SAETZE = {
+    ("Angestellte/r", True): (SATZ_KV_GESAMT, SATZ_PV_MIT_KIND, SATZ_RV, SATZ_AV),
+    ("Angestellte/r", False): (SATZ_KV_GESAMT, SATZ_PV_OHNE_KIND, SATZ_RV, SATZ_AV),
+    ("Auszubildende/r", True): (SATZ_KV_GESAMT, SATZ_PV_MIT_KIND, SATZ_RV, SATZ_AV),
+    ("Auszubildende/r", False): (SATZ_KV_GESAMT, SATZ_PV_OHNE_KIND, SATZ_RV, SATZ_AV),
+    ("Werkstudent/in", True): (0.0, 0.0, SATZ_RV, 0.0),
+    ("Werkstudent/in", False): (0.0, 0.0, SATZ_RV, 0.0),
+    ("Beamte/Beamtin", True): (0.0, 0.0, 0.0, 0.0),
+    ("Beamte/Beamtin", False): (0.0, 0.0, 0.0, 0.0),
+}
+# Zusammengefasste Sätze (KV+PV, RV+AV), damit die Sozialabgaben mit zwei Multiplikationen auskommen
+SV_RATES = {key: (kv + pv, rv + av) for key, (kv, pv, rv, av) in SV_SAETZE.items()}
+
+# Anzeigenamen je Feld von Abzuege (plus Einzelbeiträge der Detailanzeige), in Anzeigereihenfolge
+ABZUEGE_LABELS = {
+    "lohnsteuer": "Lohnsteuer",
+    "soli": "Solidaritätszuschlag",
+    "kirchensteuer": "Kirchensteuer",
+    "steuern_total": "Steuern Gesamt",
+    "kv": "Krankenversicherung",
+    "rv": "Rentenversicherung",
+    "av": "Arbeitslosenversicherung",
+    "pv": "Pflegeversicherung",
+    "sozialabgaben_total": "Sozialabgaben Gesamt",
+    "gesamt": "Gesamtabzüge",
+}
 
 # --- FUNKTIONEN ---
-def berechne_lohnsteuer(brutto_monat, steuerklasse):
-    if steuerklasse == 5:
-        return brutto_monat * 0.35
-
-    freibetrag_jahr = GRUNDFREIBETRAG.get(steuerklasse, 0)
-    if steuerklasse == 2:
-        freibetrag_jahr += ENTLASTUNGSBETRAG_SK2
+@st.cache_data(show_spinner=False, max_entries=256)
+def berechne_brutto_fuer_netto(netto_ziel, steuerklasse, bundesland, hat_kinder, kirchensteuerpflichtig, anstellungsart):
+    satz_kv_pv, satz_rv_av = SV_RATES[anstellungsart, hat_kinder]
+    satz_kirche = KIRCHENSTEUER_RATE[bundesland] if kirchensteuerpflichtig else 0.0
+    return steuerkern.brutto_fuer_netto(float(netto_ziel), int(steuerklasse), satz_kv_pv, satz_rv_av, satz_kirche)
 
-    zve_jahr = brutto_monat * 12
 
-    if zve_jahr <= freibetrag_jahr:
-        return 0.0
+# Ergebnisse werden gecacht, damit Reruns durch andere Widgets nicht neu rechnen
+@st.cache_data(show_spinner=False, max_entries=256)
+def berechne_netto_gehalt(brutto_monat, steuerklasse, bundesland, hat_kinder, kirchensteuerpflichtig, anstellungsart):
+    satz_kv_pv, satz_rv_av = SV_RATES[anstellungsart, hat_kinder]
+    satz_kirche = KIRCHENSTEUER_RATE[bundesland] if kirchensteuerpflichtig else 0.0
+    abzuege_details = Abzuege(*steuerkern.abzuege(float(brutto_monat), int(steuerklasse), satz_kv_pv, satz_rv_av, satz_kirche))
+    return brutto_monat - abzuege_details.gesamt, abzuege_details
 
-    steuer_jahr = 0
-    if zve_jahr > freibetrag_jahr:
-        y = (zve_jahr - freibetrag_jahr) / 10000
-        steuer_jahr = (979.18 * y + 1400) * y
-    if zve_jahr > 17659:
-        z = (zve_jahr - 17659) / 10000
-        steuer_jahr = (192.59 * z + 2397) * z + 1069.53
-    if zve_jahr > 66760:
-        steuer_jahr = 0.42 * zve_jahr - 10253.32
-    if zve_jahr > 277825:
-        steuer_jahr = 0.45 * zve_jahr - 18588.07
 
-    return steuer_jahr / 12
+@st.cache_data(show_spinner=False, max_entries=64)
+def berechne_netto_kurve(brutto_max, steuerklasse, bundesland, hat_kinder, kirchensteuerpflichtig, anstellungsart, punkte=200):
+    # Netto-Verlauf über eine Brutto-Spanne (für das Diagramm), als Ufunc über den Rechenkern
+    satz_kv_pv, satz_rv_av = SV_RATES[anstellungsart, hat_kinder]
+    satz_kirche = KIRCHENSTEUER_RATE[bundesland] if kirchensteuerpflichtig else 0.0
+    brutto = np.linspace(0.0, brutto_max, punkte)
+    netto = steuerkern.netto_vec(brutto, int(steuerklasse), satz_kv_pv, satz_rv_av, satz_kirche)
+    return pd.DataFrame({"Nettogehalt (€)": netto}, index=pd.Index(brutto, name="Bruttogehalt (€)"))
 
 
-def berechne_netto_gehalt(brutto_monat, steuerklasse, bundesland, hat_kinder, kirchensteuerpflichtig, anstellungsart):
-    kv_beitrag = pv_beitrag = rv_beitrag = av_beitrag = 0.0
-    brutto_kv_pv = min(brutto_monat, BBG_KV_PV)
-    brutto_rv_av = min(brutto_monat, BBG_RV_AV)
-
-    if anstellungsart in ["Angestellte/r", "Auszubildende/r"]:
-        kv_beitrag = brutto_kv_pv * SATZ_KV_GESAMT
-        rv_beitrag = brutto_rv_av * SATZ_RV
-        av_beitrag = brutto_rv_av * SATZ_AV
-        pv_beitrag = brutto_kv_pv * (SATZ_PV_MIT_KIND if hat_kinder else SATZ_PV_OHNE_KIND)
-    elif anstellungsart == "Werkstudent/in":
-        rv_beitrag = brutto_rv_av * SATZ_RV
-
-    sozialabgaben_total = kv_beitrag + rv_beitrag + av_beitrag + pv_beitrag
-
-    lohnsteuer = berechne_lohnsteuer(brutto_monat, steuerklasse)
-    soli_freigrenze_jahr = 18130
-    soli = lohnsteuer * 0.055 if lohnsteuer * 12 > soli_freigrenze_jahr else 0.0
-
-    kirchensteuer = 0.0
-    if kirchensteuerpflichtig:
-        if bundesland in ["Bayern", "Baden-Württemberg"]:
-            kirchensteuer = lohnsteuer * 0.08
-        else:
-            kirchensteuer = lohnsteuer * 0.09
-
-    steuern_total = lohnsteuer + soli + kirchensteuer
-    netto_gehalt = brutto_monat - sozialabgaben_total - steuern_total
-
-    abzuege_details = {
-        "Lohnsteuer": lohnsteuer,
-        "Solidaritätszuschlag": soli,
-        "Kirchensteuer": kirchensteuer,
-        "Steuern Gesamt": steuern_total,
-        "Krankenversicherung": kv_beitrag,
-        "Rentenversicherung": rv_beitrag,
-        "Arbeitslosenversicherung": av_beitrag,
-        "Pflegeversicherung": pv_beitrag,
-        "Sozialabgaben Gesamt": sozialabgaben_total,
-        "Gesamtabzüge": sozialabgaben_total + steuern_total
-    }
-    return netto_gehalt, abzuege_details
+def build_amazon_link(tag: str, term: str) -> str:
+    return f"https://www.amazon.de/s?k={urllib.parse.quote_plus(term)}&tag={tag}"
 
 
 # --- Streamlit App Inhalte ---
-if 'fixkosten_liste' not in st.session_state:
-    st.session_state.fixkosten_liste = []
+if 'fx_df' not in st.session_state:
+    st.session_state.fx_df = pd.DataFrame({"name": pd.Series(dtype="str"), "wert": pd.Series(dtype="float")})
 
 st.header("1. Ihre Angaben")
 
@@ -109,49 +105,32 @@ col1, col2 = st.columns(2)
 with col1:
     brutto_gehalt = st.number_input("Monatl. Bruttogehalt (€)", min_value=0.0, value=3500.0, step=100.0)
     stunden_pro_woche = st.number_input("Stunden pro Woche", min_value=1.0, max_value=80.0, value=40.0)
-    anstellungsart = st.selectbox("Anstellungsverhältnis", ["Angestellte/r", "Auszubildende/r", "Werkstudent/in", "Beamte/Beamtin"])
-    steuerklasse = st.selectbox("Steuerklasse", [1, 2, 3, 4, 5, 6], index=0)
+    anstellungsart = st.selectbox("Anstellungsverhältnis", ANSTELLUNGSARTEN)
+    steuerklasse = st.selectbox("Steuerklasse", STEUERKLASSEN, index=0)
 
 with col2:
     preis_artikel = st.number_input("Preis des Artikels (€)", min_value=0.0, value=1000.0, step=10.0)
-    bundesland = st.selectbox("Bundesland", [
-        "Baden-Württemberg", "Bayern", "Berlin", "Brandenburg", "Bremen", "Hamburg", "Hessen",
-        "Mecklenburg-Vorpommern", "Niedersachsen", "Nordrhein-Westfalen", "Rheinland-Pfalz",
-        "Saarland", "Sachsen", "Sachsen-Anhalt", "Schleswig-Holstein", "Thüringen"
-    ])
-    hat_kinder = st.radio("Haben Sie Kinder?", ["Ja", "Nein"]) == "Ja"
-    kirchensteuerpflichtig = st.radio("Kirchensteuerpflichtig?", ["Ja", "Nein"], index=1) == "Ja"
+    bundesland = st.selectbox("Bundesland", BUNDESLAENDER)
+    hat_kinder = st.radio("Haben Sie Kinder?", JA_NEIN) == "Ja"
+    kirchensteuerpflichtig = st.radio("Kirchensteuerpflichtig?", JA_NEIN, index=1) == "Ja"
 
 # --- Fixkosten ---
 st.header("2. Ihre monatlichen Fixkosten")
 
-def remove_fixkosten(index_to_remove):
-    if 0 <= index_to_remove < len(st.session_state.fixkosten_liste):
-        st.session_state.fixkosten_liste.pop(index_to_remove)
-
-with st.form(key="fixkosten_form", clear_on_submit=True):
-    col_form1, col_form2 = st.columns(2)
-    with col_form1:
-        neuer_posten_name = st.text_input("Beschreibung", placeholder="z.B. Miete, Handyvertrag...")
-    with col_form2:
-        neuer_posten_wert = st.number_input("Betrag (€)", min_value=0.01, step=0.01, format="%.2f")
-    submitted = st.form_submit_button("Hinzufügen")
-    if submitted and neuer_posten_name and neuer_posten_wert:
-        st.session_state.fixkosten_liste.append({"name": neuer_posten_name, "wert": neuer_posten_wert})
-
-if st.session_state.fixkosten_liste:
-    st.write("---")
-    for i, posten in enumerate(st.session_state.fixkosten_liste):
-        col_disp1, col_disp2, col_disp3 = st.columns([3, 2, 1])
-        with col_disp1:
-            st.write(posten["name"])
-        with col_disp2:
-            st.write(f"{posten['wert']:,.2f} €")
-        with col_disp3:
-            st.button("🗑️", key=f"delete_{i}", on_click=remove_fixkosten, args=(i,))
-    st.write("---")
-
-fixkosten_total = sum(posten['wert'] for posten in st.session_state.fixkosten_liste)
+st.caption("Posten direkt in der Tabelle hinzufügen, bearbeiten oder löschen.")
+fixkosten_df = st.data_editor(
+    st.session_state.fx_df,
+    num_rows="dynamic",
+    key="fx",
+    use_container_width=True,
+    hide_index=True,
+    column_config={
+        "name": st.column_config.TextColumn("Beschreibung", help="z.B. Miete, Handyvertrag..."),
+        "wert": st.column_config.NumberColumn("Betrag (€)", min_value=0.0, step=0.01, format="%.2f €"),
+    },
+)
+
+fixkosten_total = fixkosten_df["wert"].sum()
 
 # --- Berechnung ---
 if brutto_gehalt > 0:
@@ -170,15 +149,65 @@ if brutto_gehalt > 0:
     if monatliche_arbeitsstunden > 0:
         st.metric("Stundenlohn (Netto)", f"{netto_gehalt / monatliche_arbeitsstunden:,.2f} €")
 
+    # Ein Expander führt seinen Inhalt bei jedem Rerun aus; der Toggle baut die Tabelle nur bei Bedarf
+    if st.toggle("Details der Abzüge anzeigen"):
+        # Einzelbeiträge werden nur für die Detailanzeige berechnet
+        brutto_kv_pv = min(brutto_gehalt, BBG_KV_PV)
+        brutto_rv_av = min(brutto_gehalt, BBG_RV_AV)
+        satz_kv, satz_pv, satz_rv, satz_av = SV_SAETZE[anstellungsart, hat_kinder]
+        werte = abzuege._asdict()
+        werte.update(kv=brutto_kv_pv * satz_kv, rv=brutto_rv_av * satz_rv, av=brutto_rv_av * satz_av, pv=brutto_kv_pv * satz_pv)
+        st.table(pd.DataFrame(
+            {"Betrag": [f"{werte[feld]:,.2f} €" for feld in ABZUEGE_LABELS]},
+            index=list(ABZUEGE_LABELS.values()),
+        ))
+
+    if preis_artikel > 0:
+        st.subheader("Benötigte Arbeitszeit für den Artikel")
+        stundenlohn_verfuegbar = verfuegbares_einkommen / monatliche_arbeitsstunden
+        if stundenlohn_verfuegbar > 0:
+            # Umrechnung in Arbeitstage (8 Std.), Stunden und Minuten über ganze Sekunden
+            total_sec = int(round(preis_artikel / stundenlohn_verfuegbar * 3600))
+            stunden, rest_sec = divmod(total_sec, 3600)
+            minuten, _ = divmod(rest_sec, 60)
+            arbeitstage, stunden = divmod(stunden, 8)
+
+            ergebnis_text = ""
+            if arbeitstage > 0:
+                ergebnis_text += f"{arbeitstage} Tag(e), "
+            if stunden > 0:
+                ergebnis_text += f"{stunden} Stunde(n) und "
+            ergebnis_text += f"{minuten} Minute(n)"
+
+            st.metric(f"Um {preis_artikel:,.2f} € vom verfügbaren Einkommen zu bezahlen, arbeiten Sie:", ergebnis_text)
+        else:
+            st.warning("Nach Abzug der Fixkosten bleibt kein Einkommen für den Artikel übrig.")
+
+    st.subheader("Netto im Verhältnis zum Brutto")
+    netto_kurve = berechne_netto_kurve(max(2 * brutto_gehalt, 1000.0), steuerklasse, bundesland, hat_kinder, kirchensteuerpflichtig, anstellungsart)
+    st.line_chart(netto_kurve)
+
+    st.subheader("Wunsch-Nettogehalt")
+    wunsch_netto = st.number_input("Gewünschtes monatl. Nettogehalt (€)", min_value=0.0, value=2500.0, step=100.0, key="wunsch_netto")
+    if wunsch_netto > 0:
+        benoetigtes_brutto = berechne_brutto_fuer_netto(wunsch_netto, steuerklasse, bundesland, hat_kinder, kirchensteuerpflichtig, anstellungsart)
+        st.metric("Benötigtes Bruttogehalt", f"{benoetigtes_brutto:,.2f} €", delta=f"{benoetigtes_brutto - brutto_gehalt:,.2f} € ggü. aktuell")
+        # Das Steuermodell hat Sprünge (z.B. SK 6 bei 17.659 €/Jahr, Soli-Freigrenze); Ziele darin sind nicht exakt erreichbar
+        erreichtes_netto, _ = berechne_netto_gehalt(benoetigtes_brutto, steuerklasse, bundesland, hat_kinder, kirchensteuerpflichtig, anstellungsart)
+        if abs(erreichtes_netto - wunsch_netto) > 0.01:
+            st.warning(f"Das Wunsch-Netto ist nicht exakt erreichbar. Mit diesem Bruttogehalt ergeben sich {erreichtes_netto:,.2f} € netto.")
+
 # --- Affiliate-Link Generator ---
 st.header("4. Amazon Link zum Produkt")
 affiliate_tag = "affiliatesche-21"
-search_term = st.text_input("Was möchten Sie kaufen?", placeholder="z.B. Neues Smartphone")
 
-if st.button("Link zum Produkt generieren"):
+with st.form(key="aff"):
+    search_term = st.text_input("Was möchten Sie kaufen?", placeholder="z.B. Neues Smartphone")
+    link_submitted = st.form_submit_button("Link zum Produkt generieren")
+
+if link_submitted:
     if search_term:
-        encoded_search_term = urllib.parse.quote_plus(search_term)
-        amazon_link = f"https://www.amazon.de/s?k={encoded_search_term}&tag={affiliate_tag}"
+        amazon_link = build_amazon_link(affiliate_tag, search_term)
         st.success("Ihr Affiliate-Link wurde erstellt!")
         st.code(amazon_link, language="text")
         st.markdown(f"**[Klickbarer Link zum Testen]({amazon_link})**")
@@ -0,0 +1,91 @@
+# Rechenkern des Gehaltsrechners (Lohnsteuer, Abzüge, Netto).
+# Eigenes Modul, weil Streamlit das Hauptskript bei jeder Interaktion neu ausführt:
+# importierte Module bleiben geladen, die Numba-Funktionen entstehen nur einmal pro Prozess.
+from typing import NamedTuple
+
+import numpy as np
+from numba import njit, vectorize
+
+BBG_KV_PV = 5175.00
+BBG_RV_AV = 7550.00
+GRUNDFREIBETRAG = (11604, 11604, 23208, 11604, 0, 0)  # Index: Steuerklasse - 1
+ENTLASTUNGSBETRAG_SK2 = 4260
+SOLI_FREIGRENZE_JAHR = 18130
+SATZ_SOLI = 0.055
+# Jahresfreibetrag je Steuerklasse (inkl. Entlastungsbetrag SK 2), als Array für Numba
+FREIBETRAG_JAHR = np.array(
+    [fb + (ENTLASTUNGSBETRAG_SK2 if sk == 2 else 0) for sk, fb in enumerate(GRUNDFREIBETRAG, start=1)],
+    dtype=np.float64,
+)
+
+
+# Liegt hier statt im Hauptskript, damit st.cache_data es als steuerkern.Abzuege pickeln kann
+# (das __main__-Modul des Skripts wird bei jedem Lauf neu angelegt)
+class Abzuege(NamedTuple):
+    # Monatliche Abzüge in €, als leichtgewichtiges Tupel statt Dict mit String-Keys
+    lohnsteuer: float
+    soli: float
+    kirchensteuer: float
+    steuern_total: float
+    sozialabgaben_total: float
+    gesamt: float
+
+
+@njit(cache=True)
+def lohnsteuer(brutto_monat, steuerklasse):
+    if steuerklasse == 5:
+        return brutto_monat * 0.35
+
+    freibetrag_jahr = FREIBETRAG_JAHR[steuerklasse - 1]
+    zve_jahr = brutto_monat * 12
+
+    if zve_jahr <= freibetrag_jahr:
+        return 0.0
+    if zve_jahr > 277825:
+        steuer_jahr = 0.45 * zve_jahr - 18588.07
+    elif zve_jahr > 66760:
+        steuer_jahr = 0.42 * zve_jahr - 10253.32
+    elif zve_jahr > 17659:
+        z = (zve_jahr - 17659) / 10000
+        steuer_jahr = (192.59 * z + 2397) * z + 1069.53
+    else:
+        y = (zve_jahr - freibetrag_jahr) / 10000
+        steuer_jahr = (979.18 * y + 1400) * y
+
+    return steuer_jahr / 12
+
+
+@njit(cache=True)
+def abzuege(brutto_monat, steuerklasse, satz_kv_pv, satz_rv_av, satz_kirche):
+    # Einzige Stelle mit der Abzugsformel; Reihenfolge wie die Felder von Abzuege
+    sozialabgaben_total = min(brutto_monat, BBG_KV_PV) * satz_kv_pv + min(brutto_monat, BBG_RV_AV) * satz_rv_av
+    steuer = lohnsteuer(brutto_monat, steuerklasse)
+    soli = steuer * SATZ_SOLI if steuer * 12 > SOLI_FREIGRENZE_JAHR else 0.0
+    kirchensteuer = steuer * satz_kirche
+    steuern_total = steuer + soli + kirchensteuer
+    return steuer, soli, kirchensteuer, steuern_total, sozialabgaben_total, sozialabgaben_total + steuern_total
+
+
+@njit(cache=True)
+def netto(brutto_monat, steuerklasse, satz_kv_pv, satz_rv_av, satz_kirche):
+    return brutto_monat - abzuege(brutto_monat, steuerklasse, satz_kv_pv, satz_rv_av, satz_kirche)[5]
+
+
+@vectorize(["float64(float64, int64, float64, float64, float64)"], cache=True)
+def netto_vec(brutto_monat, steuerklasse, satz_kv_pv, satz_rv_av, satz_kirche):
+    # Ufunc-Variante von netto für ganze Gehaltsreihen (Diagramm), gleiche Formel
+    return netto(brutto_monat, steuerklasse, satz_kv_pv, satz_rv_av, satz_kirche)
+
+
+@njit(cache=True)
+def brutto_fuer_netto(netto_ziel, steuerklasse, satz_kv_pv, satz_rv_av, satz_kirche):
+    # Bisektion über das Bruttogehalt, bis das Netto dem Ziel entspricht
+    unten = 0.0
+    oben = 4.0 * netto_ziel + 1000.0
+    for _ in range(60):
+        brutto = (unten + oben) / 2
+        if netto(brutto, steuerklasse, satz_kv_pv, satz_rv_av, satz_kirche) < netto_ziel:
+            unten = brutto
+        else:
+            oben = brutto
+    return oben